@@ -1,34 +1,41 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Depends, Request, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 import os
-from datetime import datetime
-from supabase import create_client, Client
-import cloudinary
-import cloudinary.uploader
+import asyncio
+import math
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import httpx
+from async_lru import alru_cache
+from pydantic import TypeAdapter
 
-from models.schemas import TreeDataUpload, AnalysisRequest, ReportRequest
+from models.schemas import TreeData, TreeDataUpload, AnalysisRequest, ReportRequest
+from services.clients import get_supabase, get_cloudinary, create_http_client, cloudinary_upload
 from services.analysis import TreeAnalyzer
 from services.report_generator import ReportGenerator
 # Visualization removed to avoid matplotlib dependency
 
-# Initialize
-SUPABASE_URL = os.environ.get("SUPABASE_URL")
-SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the shared clients once per worker, before the first request
+    get_supabase()
+    get_cloudinary()
+    app.state.http = create_http_client()
+    yield
+    await app.state.http.aclose()
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    raise ValueError("Missing Supabase credentials")
-
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
-cloudinary.config(
-    cloud_name=os.environ.get("CLOUDINARY_CLOUD_NAME"),
-    api_key=os.environ.get("CLOUDINARY_API_KEY"),
-    api_secret=os.environ.get("CLOUDINARY_API_SECRET")
+app = FastAPI(
+    title="ArborTag API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-app = FastAPI(title="ArborTag API", version="1.0.0")
-
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -37,6 +44,104 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Serializes a whole upload in one call, ready for the Supabase insert
+_TREES_ADAPTER = TypeAdapter(List[TreeData])
+
+def get_http(request: Request) -> httpx.AsyncClient:
+    return request.app.state.http
+
+# PostgREST's default max-rows; larger tables are fetched page by page
+PAGE_SIZE = 1000
+MAX_CONCURRENT_PAGES = 8
+
+async def _fetch_trees(location: Optional[str] = None) -> List[Dict]:
+    """Fetch every matching tree, requesting the remaining pages concurrently"""
+    def fetch_page(page: int, count: Optional[str] = None):
+        query = get_supabase().table('trees').select(",".join(TreeAnalyzer.COLUMNS), count=count)
+        if location:
+            query = query.eq('location', location)
+        return query.order('id').limit(PAGE_SIZE).offset(page * PAGE_SIZE).execute()
+
+    first = await run_in_threadpool(fetch_page, 0, 'exact')
+    num_pages = math.ceil((first.count or 0) / PAGE_SIZE)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+
+    async def fetch(page: int):
+        async with semaphore:
+            return await run_in_threadpool(fetch_page, page)
+
+    rest = await asyncio.gather(*[fetch(page) for page in range(1, num_pages)])
+
+    trees = list(first.data)
+    for result in rest:
+        trees.extend(result.data)
+    return trees
+
+INSERT_CHUNK_SIZE = 500
+MAX_CONCURRENT_INSERTS = 4
+
+async def _insert_trees(trees: List[Dict]) -> List[Dict]:
+    """Insert trees in bounded chunks, several requests in flight at once.
+
+    Waits for every chunk and returns the row ranges of the chunks that failed.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_INSERTS)
+
+    async def insert(chunk: List[Dict]):
+        async with semaphore:
+            return await run_in_threadpool(lambda: get_supabase().table('trees').insert(chunk).execute())
+
+    starts = range(0, len(trees), INSERT_CHUNK_SIZE)
+    results = await asyncio.gather(
+        *[insert(trees[start:start + INSERT_CHUNK_SIZE]) for start in starts],
+        return_exceptions=True
+    )
+    return [
+        {"start": start, "end": min(start + INSERT_CHUNK_SIZE, len(trees)), "error": str(result)}
+        for start, result in zip(starts, results)
+        if isinstance(result, Exception)
+    ]
+
+# Bumped on every upload so cached analyzers never outlive the data they were built from
+_data_generation = 0
+
+async def _data_version(location: Optional[str] = None) -> str:
+    """Cheap fingerprint of the trees matching a location"""
+    def trees(columns: str, count: Optional[str] = None):
+        query = get_supabase().table('trees').select(columns, count=count)
+        if location:
+            query = query.eq('location', location)
+        return query
+
+    # Count every row so deletes are caught, including rows stored with a null created_at
+    def total():
+        return trees('id', 'exact').limit(1).execute()
+
+    def latest():
+        query = trees('created_at').not_.is_('created_at', 'null')
+        return query.order('created_at', desc=True).limit(1).execute()
+
+    counted, newest = await asyncio.gather(run_in_threadpool(total), run_in_threadpool(latest))
+    latest_created = newest.data[0]['created_at'] if newest.data else None
+    return f"{_data_generation}:{counted.count}:{latest_created}"
+
+# The ttl also picks up in-place edits, which the fingerprint cannot see
+@alru_cache(maxsize=32, ttl=300)
+async def _build_analyzer(location: Optional[str], version: str) -> Optional[TreeAnalyzer]:
+    trees = await _fetch_trees(location)
+    return await run_in_threadpool(TreeAnalyzer, trees) if trees else None
+
+# Version last built per location, so a superseded analyzer is evicted instead of aging out
+_analyzer_versions: Dict[Optional[str], str] = {}
+
+async def _get_analyzer(location: Optional[str] = None) -> Optional[TreeAnalyzer]:
+    version = await _data_version(location)
+    previous = _analyzer_versions.get(location)
+    if previous is not None and previous != version:
+        _build_analyzer.cache_invalidate(location, previous)
+    _analyzer_versions[location] = version
+    return await _build_analyzer(location, version)
+
 @app.get("/")
 async def root():
     return {
@@ -54,32 +159,53 @@ async def health():
 
 @app.post("/api/upload-data")
 async def upload(data: TreeDataUpload):
+    global _data_generation
     try:
-        trees = [tree.dict() for tree in data.trees]
-        result = supabase.table('trees').insert(trees).execute()
+        trees = _TREES_ADAPTER.dump_python(data.trees, mode='json')
+        # An explicit null would override the column default and hide the row from _data_version
+        uploaded_at = datetime.now(timezone.utc).isoformat()
+        for tree in trees:
+            if tree['created_at'] is None:
+                tree['created_at'] = uploaded_at
+        try:
+            failed = await _insert_trees(trees)
+        finally:
+            # All chunks have settled; any of them may have landed even if others failed
+            _data_generation += 1
+            _compute_stats.cache_clear()
+            _distinct_locations.cache_clear()
+
+        if failed:
+            inserted = len(trees) - sum(chunk['end'] - chunk['start'] for chunk in failed)
+            raise HTTPException(status_code=500, detail={
+                "message": f"Uploaded {inserted} of {len(trees)} trees",
+                "count": inserted,
+                "failed": failed
+            })
+
         return {
             "status": "success",
             "message": f"Uploaded {len(trees)} trees",
             "count": len(trees)
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/analyze")
 async def analyze(request: AnalysisRequest):
     try:
-        query = supabase.table('trees').select("*")
-        if request.location:
-            query = query.eq('location', request.location)
-        result = query.execute()
+        analyzer = await _get_analyzer(request.location)
 
-        if not result.data:
+        if analyzer is None:
             raise HTTPException(status_code=404, detail="No data found")
 
-        analyzer = TreeAnalyzer(result.data)
-        stats = analyzer.get_statistics()
-        species_dist = analyzer.get_species_distribution()
-        carbon_by_species = analyzer.get_carbon_by_species()
+        stats, species_dist, carbon_by_species = await run_in_threadpool(lambda: (
+            analyzer.get_statistics(),
+            analyzer.get_species_distribution(),
+            analyzer.get_carbon_by_species()
+        ))
 
         return {
             "status": "success",
@@ -90,63 +216,86 @@ async def analyze(request: AnalysisRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/generate-report")
-async def report(request: ReportRequest):
-    try:
-        query = supabase.table('trees').select("*")
-        if request.location:
-            query = query.eq('location', request.location)
-        result = query.execute()
+REPORT_FOLDER = "arbortag_reports"
+MAX_REPORT_JOBS = 256
 
-        if not result.data:
-            raise HTTPException(status_code=404, detail="No data found")
+# Status of recent report jobs, oldest first; per process, like the caches above
+_report_jobs: "OrderedDict[str, Dict]" = OrderedDict()
+
+def _report_filename(location: str, job_id: str) -> str:
+    return f"report_{location}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{job_id}"
 
-        analyzer = TreeAnalyzer(result.data)
+def _new_report_job() -> str:
+    job_id = uuid.uuid4().hex
+    _report_jobs[job_id] = {"job_id": job_id, "status": "pending"}
+    while len(_report_jobs) > MAX_REPORT_JOBS:
+        _report_jobs.popitem(last=False)
+    return job_id
+
+async def _run_report_job(job_id: str, location: str, analyzer: TreeAnalyzer, http: httpx.AsyncClient):
+    try:
         generator = ReportGenerator(analyzer, None)  # No visualizer
-        pdf = generator.generate_pdf_report(request.location)
+        pdf = await run_in_threadpool(generator.generate_pdf_report, location)
 
-        filename = f"report_{request.location}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        upload = cloudinary.uploader.upload(
+        upload = await cloudinary_upload(
+            http,
             pdf,
             resource_type="raw",
-            public_id=filename,
-            folder="arbortag_reports"
+            public_id=_report_filename(location, job_id),
+            folder=REPORT_FOLDER
         )
+        _report_jobs[job_id] = {"job_id": job_id, "status": "success", "report_url": upload['secure_url']}
+    except Exception as e:
+        _report_jobs[job_id] = {"job_id": job_id, "status": "failed", "detail": str(e)}
+
+@app.post("/api/generate-report", status_code=202)
+async def report(request: ReportRequest, background_tasks: BackgroundTasks,
+                 http: httpx.AsyncClient = Depends(get_http)):
+    try:
+        analyzer = await _get_analyzer(request.location)
+
+        if analyzer is None:
+            raise HTTPException(status_code=404, detail="No data found")
+
+        job_id = _new_report_job()
+        background_tasks.add_task(_run_report_job, job_id, request.location, analyzer, http)
 
         return {
-            "status": "success",
-            "report_url": upload['secure_url'],
-            "message": "Report generated successfully"
+            "status": "accepted",
+            "job_id": job_id,
+            "message": "Report generation started"
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/reports/{job_id}")
+async def report_status(job_id: str):
+    job = _report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown report job")
+    return job
+
+@alru_cache(maxsize=64, ttl=60)
+async def _compute_stats(location: Optional[str] = None):
+    result = await run_in_threadpool(lambda: get_supabase().rpc('tree_stats', {'loc': location}).execute())
+    return result.data
+
+@alru_cache(maxsize=1, ttl=300)
+async def _distinct_locations():
+    result = await run_in_threadpool(lambda: get_supabase().rpc('distinct_locations', {}).execute())
+    return [row['location'] for row in result.data]
+
 @app.get("/api/statistics")
 async def stats():
     try:
-        result = supabase.table('trees').select("*").execute()
-
-        if not result.data:
-            return {
-                "total_trees": 0,
-                "total_carbon": 0,
-                "total_oxygen": 0,
-                "avg_height": 0,
-                "avg_width": 0,
-                "total_locations": 0,
-                "total_species": 0
-            }
-
-        analyzer = TreeAnalyzer(result.data)
-        return analyzer.get_statistics()
+        return await _compute_stats(None)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/locations")
 async def get_locations():
     try:
-        result = supabase.table('trees').select("location").execute()
-        locations = list(set([tree['location'] for tree in result.data]))
+        locations = await _distinct_locations()
         return {"locations": locations}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
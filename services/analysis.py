@@ -2,38 +2,70 @@ import pandas as pd
 import numpy as np
 from typing import Dict, List
 from collections import Counter
+from functools import cached_property
 
 class TreeAnalyzer:
+    # Columns used by the analysis, report and visualization code
+    COLUMNS = ['id', 'species_id', 'common_name', 'latitude', 'longitude', 'height',
+               'width', 'carbon_seq', 'oxygen_prod', 'location', 'date']
+    NUMERIC_COLUMNS = ['latitude', 'longitude', 'height', 'width', 'carbon_seq', 'oxygen_prod']
+
     def __init__(self, trees: List[Dict]):
-        self.df = pd.DataFrame(trees)
+        self.df = pd.DataFrame.from_records(trees, columns=self.COLUMNS).astype(
+            {column: 'float64' for column in self.NUMERIC_COLUMNS}
+        )
         
     def get_statistics(self) -> Dict:
         """Calculate comprehensive statistics"""
         stats = {
-            'total_trees': len(self.df),
-            'total_carbon': self.df['carbon_seq'].sum(),
-            'total_oxygen': self.df['oxygen_prod'].sum() if 'oxygen_prod' in self.df else 0,
-            'avg_height': self.df['height'].mean(),
-            'avg_width': self.df['width'].mean(),
-            'total_locations': self.df['location'].nunique(),
-            'total_species': self.df['species_id'].nunique(),
-            'most_common_species': self.df['common_name'].mode()[0] if len(self.df) > 0 else 'N/A',
+            'total_trees': int(len(self.df)),
+            'total_carbon': float(self.df['carbon_seq'].sum()),
+            'total_oxygen': float(self.df['oxygen_prod'].sum()),
+            'avg_height': float(self.df['height'].mean()),
+            'avg_width': float(self.df['width'].mean()),
+            'total_locations': int(self.df['location'].nunique()),
+            'total_species': int(self.df['species_id'].nunique()),
         }
         
+        species, counts, carbon_sums, carbon_counts = self._species_totals
+        stats['most_common_species'] = species[counts.argmax()] if len(species) > 0 else 'N/A'
+        
         # Most carbon efficient species
-        species_carbon = self.df.groupby('common_name')['carbon_seq'].mean()
-        stats['most_carbon_efficient'] = species_carbon.idxmax() if len(species_carbon) > 0 else 'N/A'
+        with np.errstate(invalid='ignore', divide='ignore'):
+            species_carbon = carbon_sums / carbon_counts
+        has_carbon = carbon_counts > 0
+        stats['most_carbon_efficient'] = (
+            species[np.nanargmax(np.where(has_carbon, species_carbon, np.nan))] if has_carbon.any() else 'N/A'
+        )
         
         return stats
     
+    @cached_property
+    def _species_totals(self):
+        """Per-species row counts and carbon sums from one factorize pass"""
+        # Sorted codes keep ties resolving to the same species as groupby/mode
+        codes, species = pd.factorize(self.df['common_name'].to_numpy(), sort=True)
+        named = codes >= 0
+        codes = codes[named]
+        carbon = self.df['carbon_seq'].to_numpy()[named]
+        has_carbon = ~np.isnan(carbon)
+        
+        counts = np.bincount(codes, minlength=len(species))
+        carbon_sums = np.bincount(codes, weights=np.where(has_carbon, carbon, 0.0), minlength=len(species))
+        carbon_counts = np.bincount(codes, weights=has_carbon, minlength=len(species))
+        return species, counts, carbon_sums, carbon_counts
+    
     def get_species_distribution(self) -> Dict:
         """Get species distribution data"""
-        distribution = self.df['common_name'].value_counts().to_dict()
+        species, counts, _, _ = self._species_totals
+        order = np.argsort(-counts, kind='stable')
+        distribution = dict(zip(species[order].tolist(), counts[order].tolist()))
         return distribution
     
     def get_carbon_by_species(self) -> Dict:
         """Get carbon sequestration by species"""
-        carbon = self.df.groupby('common_name')['carbon_seq'].sum().to_dict()
+        species, _, carbon_sums, _ = self._species_totals
+        carbon = dict(zip(species.tolist(), carbon_sums.tolist()))
         return carbon
     
     def get_height_distribution(self) -> Dict:
@@ -44,22 +76,40 @@ class TreeAnalyzer:
     
     def get_location_stats(self) -> Dict:
         """Get statistics by location"""
-        location_stats = {}
-        for location in self.df['location'].unique():
-            loc_data = self.df[self.df['location'] == location]
-            location_stats[location] = {
-                'tree_count': len(loc_data),
-                'total_carbon': loc_data['carbon_seq'].sum(),
-                'avg_height': loc_data['height'].mean(),
-                'species_count': loc_data['species_id'].nunique(),
-            }
-        return location_stats
+        location_stats = self.df.groupby('location', sort=False).agg(
+            tree_count=('carbon_seq', 'size'),
+            total_carbon=('carbon_seq', 'sum'),
+            avg_height=('height', 'mean'),
+            species_count=('species_id', 'nunique'),
+        )
+        return location_stats.to_dict('index')
+    
+    @cached_property
+    def _survey_months(self):
+        """Survey month of each tree as months since 1970-01, and which rows have a date"""
+        dates = pd.to_datetime(self.df['date'], format='ISO8601', cache=True)
+        months = dates.to_numpy(dtype='datetime64[M]').astype('int64')
+        return months, dates.notna().to_numpy()
     
     def get_temporal_analysis(self) -> Dict:
         """Analyze data over time"""
-        self.df['date'] = pd.to_datetime(self.df['date'])
-        temporal = self.df.groupby(self.df['date'].dt.to_period('M')).agg({
-            'carbon_seq': 'sum',
-            'id': 'count'
-        }).to_dict()
+        months, dated = self._survey_months
+        if not dated.any():
+            return {'carbon_seq': {}, 'id': {}}
+        
+        months = months[dated]
+        first = months.min()
+        buckets = months - first
+        carbon = np.nan_to_num(self.df['carbon_seq'].to_numpy()[dated])
+        has_id = self.df['id'].notna().to_numpy()[dated]
+        
+        rows = np.bincount(buckets)
+        carbon_sums = np.bincount(buckets, weights=carbon)
+        id_counts = np.bincount(buckets, weights=has_id).astype('int64')
+        
+        temporal = {'carbon_seq': {}, 'id': {}}
+        for bucket in np.flatnonzero(rows):
+            period = pd.Period(ordinal=int(first + bucket), freq='M')
+            temporal['carbon_seq'][period] = float(carbon_sums[bucket])
+            temporal['id'][period] = int(id_counts[bucket])
         return temporal
\ No newline at end of file
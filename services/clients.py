@@ -0,0 +1,46 @@
+import os
+import time
+from functools import lru_cache
+from typing import Dict
+import httpx
+from supabase import create_client, Client
+import cloudinary
+import cloudinary.utils
+
+@lru_cache(maxsize=1)
+def get_supabase() -> Client:
+    """Return the process-wide Supabase client"""
+    url = os.environ.get("SUPABASE_URL")
+    key = os.environ.get("SUPABASE_KEY")
+
+    if not url or not key:
+        raise ValueError("Missing Supabase credentials")
+
+    return create_client(url, key)
+
+@lru_cache(maxsize=1)
+def get_cloudinary():
+    """Configure Cloudinary once and return its config"""
+    return cloudinary.config(
+        cloud_name=os.environ.get("CLOUDINARY_CLOUD_NAME"),
+        api_key=os.environ.get("CLOUDINARY_API_KEY"),
+        api_secret=os.environ.get("CLOUDINARY_API_SECRET")
+    )
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build the keep-alive HTTP client shared for the app's lifetime"""
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+    )
+
+async def cloudinary_upload(http: httpx.AsyncClient, file, resource_type: str = "image", **options) -> Dict:
+    """Signed upload to Cloudinary through the shared HTTP client"""
+    get_cloudinary()
+    params = cloudinary.utils.sign_request({**options, "timestamp": int(time.time())}, {})
+    url = cloudinary.utils.cloudinary_api_url("upload", resource_type=resource_type)
+
+    response = await http.post(url, data=params, files={"file": file})
+    response.raise_for_status()
+    return response.json()
@@ -1,57 +1,112 @@
 from reportlab.lib.pagesizes import A4, letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
+from reportlab.platypus import Frame, Paragraph, Spacer, Table, TableStyle, Image
+from reportlab.pdfgen import canvas
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from datetime import datetime
+from heapq import nlargest
 from io import BytesIO
+from operator import itemgetter
 import tempfile
 import os
 
+_STYLES = getSampleStyleSheet()
+
+_TITLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_STYLES['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#0f544b'),
+    spaceAfter=30,
+    alignment=TA_CENTER
+)
+
+_HEADING = ParagraphStyle(
+    'CustomHeading',
+    parent=_STYLES['Heading2'],
+    fontSize=16,
+    textColor=colors.HexColor('#27ae60'),
+    spaceAfter=12,
+    spaceBefore=12
+)
+
+_TABLE_STYLE_SUMMARY = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0f544b')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.lightgrey, colors.white])
+])
+
+_TABLE_STYLE_SPECIES = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#27ae60')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+
+_TABLE_STYLE_CARBON = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+])
+
 class ReportGenerator:
     def __init__(self, analyzer, visualizer):
         self.analyzer = analyzer
         self.visualizer = visualizer
         
+    @staticmethod
+    def _draw_page(pdf: canvas.Canvas, flowables: list):
+        """Draw one section straight onto the canvas and end the page"""
+        width, height = A4
+        # Flowables are consumed as they are drawn; anything left spills onto another page
+        while flowables:
+            frame = Frame(inch, inch, width - 2*inch, height - 2*inch)
+            drawn = False
+            while flowables:
+                if frame.add(flowables[0], pdf, trySplit=0):
+                    del flowables[0]
+                    drawn = True
+                    continue
+                # Too tall for the space left: split it, as SimpleDocTemplate did
+                parts = frame.split(flowables[0], pdf)
+                if not parts or not frame.add(parts[0], pdf, trySplit=0):
+                    break
+                flowables[0:1] = parts[1:]
+                drawn = True
+                break
+            pdf.showPage()
+            if not drawn:
+                raise ValueError("Report section does not fit on a page")
+        
     def generate_pdf_report(self, location: str = None) -> BytesIO:
         """Generate comprehensive PDF report"""
         buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
+        pdf = canvas.Canvas(buffer, pagesize=A4)
         story = []
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#0f544b'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#27ae60'),
-            spaceAfter=12,
-            spaceBefore=12
-        )
         
         # Title
         title = f"Tree Census Report - {location if location else 'All Locations'}"
-        story.append(Paragraph(title, title_style))
+        story.append(Paragraph(title, _TITLE))
         story.append(Spacer(1, 0.3*inch))
         
         # Date
         date_text = f"Generated on: {datetime.now().strftime('%B %d, %Y at %H:%M')}"
-        story.append(Paragraph(date_text, styles['Normal']))
+        story.append(Paragraph(date_text, _STYLES['Normal']))
         story.append(Spacer(1, 0.3*inch))
         
         # Executive Summary
-        story.append(Paragraph("Executive Summary", heading_style))
+        story.append(Paragraph("Executive Summary", _HEADING))
         stats = self.analyzer.get_statistics()
         
         summary_data = [
@@ -68,35 +123,25 @@ class ReportGenerator:
         ]
         
         table = Table(summary_data, colWidths=[3*inch, 2*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0f544b')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.lightgrey, colors.white])
-        ]))
+        table.setStyle(_TABLE_STYLE_SUMMARY)
         
         story.append(table)
-        story.append(PageBreak())
+        self._draw_page(pdf, story)
         
         # Species Analysis
-        story.append(Paragraph("Species Analysis", heading_style))
+        story.append(Paragraph("Species Analysis", _HEADING))
         species_dist = self.analyzer.get_species_distribution()
         
         story.append(Paragraph(
             f"A total of {len(species_dist)} different species were recorded. "
             f"The most abundant species is {stats['most_common_species']}, "
             f"representing a significant portion of the urban forest canopy.",
-            styles['Normal']
+            _STYLES['Normal']
         ))
         story.append(Spacer(1, 0.2*inch))
         
         # Top 5 species table
-        top_species = sorted(species_dist.items(), key=lambda x: x[1], reverse=True)[:5]
+        top_species = nlargest(5, species_dist.items(), key=itemgetter(1))
         species_table_data = [['Species', 'Count', 'Percentage']]
         total_trees = stats['total_trees']
         
@@ -105,19 +150,13 @@ class ReportGenerator:
             species_table_data.append([species, str(count), f"{percentage:.1f}%"])
         
         species_table = Table(species_table_data, colWidths=[3*inch, 1*inch, 1*inch])
-        species_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#27ae60')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
+        species_table.setStyle(_TABLE_STYLE_SPECIES)
         
         story.append(species_table)
-        story.append(PageBreak())
+        self._draw_page(pdf, story)
         
         # Carbon Impact
-        story.append(Paragraph("Environmental Impact", heading_style))
+        story.append(Paragraph("Environmental Impact", _HEADING))
         
         carbon_text = f"""
         The trees surveyed sequester a total of {stats['total_carbon']:.2f} kg of CO₂ per year,
@@ -126,33 +165,27 @@ class ReportGenerator:
         produce {stats['total_oxygen']:.2f} kg of oxygen per year, contributing significantly 
         to air quality improvement and ecosystem health.
         """
-        story.append(Paragraph(carbon_text, styles['Normal']))
+        story.append(Paragraph(carbon_text, _STYLES['Normal']))
         story.append(Spacer(1, 0.3*inch))
         
         # Carbon by species
         carbon_data = self.analyzer.get_carbon_by_species()
-        top_carbon = sorted(carbon_data.items(), key=lambda x: x[1], reverse=True)[:5]
+        top_carbon = nlargest(5, carbon_data.items(), key=itemgetter(1))
         
         carbon_table_data = [['Species', 'Carbon Sequestration (kg CO₂/year)']]
         for species, carbon in top_carbon:
             carbon_table_data.append([species, f"{carbon:.2f}"])
         
         carbon_table = Table(carbon_table_data, colWidths=[3*inch, 2*inch])
-        carbon_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498db')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ]))
-        
-        story.append(Paragraph("Top Carbon Sequestration by Species", styles['Heading3']))
+        carbon_table.setStyle(_TABLE_STYLE_CARBON)
+        
+        story.append(Paragraph("Top Carbon Sequestration by Species", _STYLES['Heading3']))
         story.append(Spacer(1, 0.1*inch))
         story.append(carbon_table)
-        story.append(PageBreak())
+        self._draw_page(pdf, story)
         
         # Recommendations
-        story.append(Paragraph("Recommendations", heading_style))
+        story.append(Paragraph("Recommendations", _HEADING))
         
         recommendations = f"""
         Based on the analysis of {stats['total_trees']} trees across {stats['total_locations']} locations:
@@ -171,7 +204,7 @@ class ReportGenerator:
         {stats['total_carbon'] * 0.2:.2f} kg.
         """
         
-        story.append(Paragraph(recommendations, styles['Normal']))
+        story.append(Paragraph(recommendations, _STYLES['Normal']))
         story.append(Spacer(1, 0.3*inch))
         
         # Footer
@@ -184,9 +217,10 @@ class ReportGenerator:
         </font>
         </para>
         """
-        story.append(Paragraph(footer_text, styles['Normal']))
+        story.append(Paragraph(footer_text, _STYLES['Normal']))
         
-        # Build PDF
-        doc.build(story)
+        # Finish PDF
+        self._draw_page(pdf, story)
+        pdf.save()
         buffer.seek(0)
         return buffer
\ No newline at end of file
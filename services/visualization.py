@@ -1,17 +1,43 @@
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.graph_objects as go
-import plotly.express as px
 from io import BytesIO
 import base64
+import hashlib
+import httpx
+from fastapi.concurrency import run_in_threadpool
+
+from services.clients import cloudinary_upload
+
+CHART_FOLDER = "arbortag_charts"
 
 class TreeVisualizer:
-    def __init__(self, analyzer):
+    """Renders analyzer charts as PNGs hosted on Cloudinary.
+
+    Needs plotly and kaleido, which are not in requirements.txt while the
+    visualizer is not wired into the API.
+    """
+    def __init__(self, analyzer, http: httpx.AsyncClient):
         self.analyzer = analyzer
-        sns.set_style("whitegrid")
+        self.http = http
+        
+    async def _publish(self, fig, name: str) -> str:
+        """Render a figure to PNG, upload it to Cloudinary and return its URL"""
+        png = await run_in_threadpool(fig.to_image, format='png', width=800, height=500, engine='kaleido')
+        # Identical charts map to the same asset instead of piling up new ones
+        public_id = f"{name}_{hashlib.sha1(png).hexdigest()[:16]}"
+        upload = await cloudinary_upload(
+            self.http,
+            png,
+            folder=CHART_FOLDER,
+            public_id=public_id,
+            overwrite=False,
+            eager="f_webp,q_auto",
+            eager_async=True
+        )
+        return upload['secure_url']
+        
+    async def create_species_pie_chart(self) -> str:
+        """Create species distribution pie chart, returning its image URL"""
+        import plotly.graph_objects as go
         
-    def create_species_pie_chart(self) -> str:
-        """Create species distribution pie chart"""
         distribution = self.analyzer.get_species_distribution()
         
         fig = go.Figure(data=[go.Pie(
@@ -25,10 +51,12 @@ class TreeVisualizer:
             font=dict(size=14)
         )
         
-        return fig.to_html()
+        return await self._publish(fig, 'species_pie')
     
-    def create_carbon_bar_chart(self) -> str:
-        """Create carbon sequestration bar chart"""
+    async def create_carbon_bar_chart(self) -> str:
+        """Create carbon sequestration bar chart, returning its image URL"""
+        import plotly.graph_objects as go
+        
         carbon_data = self.analyzer.get_carbon_by_species()
         
         # Sort by value
@@ -47,10 +75,12 @@ class TreeVisualizer:
             font=dict(size=12)
         )
         
-        return fig.to_html()
+        return await self._publish(fig, 'carbon_bar')
     
-    def create_height_distribution(self) -> str:
-        """Create height distribution histogram"""
+    async def create_height_distribution(self) -> str:
+        """Create height distribution histogram, returning its image URL"""
+        import plotly.express as px
+        
         df = self.analyzer.df
         
         fig = px.histogram(
@@ -63,10 +93,12 @@ class TreeVisualizer:
         
         fig.update_traces(marker_color='#3498db')
         
-        return fig.to_html()
+        return await self._publish(fig, 'height_distribution')
     
-    def create_location_comparison(self) -> str:
-        """Create location comparison chart"""
+    async def create_location_comparison(self) -> str:
+        """Create location comparison chart, returning its image URL"""
+        import plotly.graph_objects as go
+        
         location_stats = self.analyzer.get_location_stats()
         
         locations = list(location_stats.keys())
@@ -84,10 +116,12 @@ class TreeVisualizer:
             font=dict(size=12)
         )
         
-        return fig.to_html()
+        return await self._publish(fig, 'location_comparison')
     
-    def create_heatmap(self) -> str:
-        """Create geographical heatmap"""
+    async def create_heatmap(self) -> str:
+        """Create geographical heatmap, returning its image URL"""
+        import plotly.express as px
+        
         df = self.analyzer.df
         
         fig = px.density_mapbox(
@@ -102,4 +136,4 @@ class TreeVisualizer:
             title="Carbon Sequestration Heatmap"
         )
         
-        return fig.to_html()
\ No newline at end of file
+        return await self._publish(fig, 'heatmap')
\ No newline at end of file
@@ -0,0 +1,8 @@
+-- Distinct tree locations, computed in Postgres for /api/locations
+create or replace function distinct_locations()
+returns table(location text)
+language sql
+stable
+as $$
+    select distinct location from trees
+$$;
@@ -0,0 +1,4 @@
+-- Keep location-filtered queries index-backed so pooled backends stay short-lived
+create index if not exists trees_location_idx on trees (location);
+
+analyze trees;
@@ -0,0 +1,27 @@
+-- Summary statistics for /api/statistics, optionally scoped to one location
+create or replace function tree_stats(loc text default null)
+returns json
+language sql
+stable
+as $$
+    select json_build_object(
+        'total_trees', count(*),
+        'total_carbon', coalesce(sum(carbon_seq), 0),
+        'total_oxygen', coalesce(sum(oxygen_prod), 0),
+        'avg_height', coalesce(avg(height), 0),
+        'avg_width', coalesce(avg(width), 0),
+        'total_locations', count(distinct location),
+        'total_species', count(distinct species_id),
+        'most_common_species', coalesce(mode() within group (order by common_name), 'N/A'),
+        'most_carbon_efficient', coalesce((
+            select common_name
+            from trees
+            where (loc is null or location = loc) and common_name is not null
+            group by common_name
+            order by avg(carbon_seq) desc nulls last, common_name
+            limit 1
+        ), 'N/A')
+    )
+    from trees
+    where loc is null or location = loc
+$$;
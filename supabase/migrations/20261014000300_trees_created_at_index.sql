@@ -0,0 +1,2 @@
+-- Lets the analyzer cache read the latest created_at without a table scan
+create index if not exists trees_created_at_idx on trees (created_at desc);
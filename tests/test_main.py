@@ -0,0 +1,116 @@
+import asyncio
+import json
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from postgrest._sync.client import SyncPostgrestClient
+from postgrest.utils import SyncClient
+
+import main
+from services.clients import get_supabase
+
+@pytest.fixture
+def postgrest(monkeypatch):
+    """Route the real Supabase client's REST calls to an in-memory handler"""
+    requests = []
+    responses = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return responses[request.url.path](request)
+
+    def create_session(self, base_url, headers, timeout):
+        return SyncClient(base_url=base_url, headers=headers, timeout=timeout,
+                          transport=httpx.MockTransport(handler))
+
+    monkeypatch.setenv("SUPABASE_URL", "https://example.supabase.co")
+    monkeypatch.setenv("SUPABASE_KEY", "eyJhbGciOiJIUzI1NiJ9.e30.signature")
+    monkeypatch.setattr(SyncPostgrestClient, "create_session", create_session)
+    get_supabase.cache_clear()
+    main._distinct_locations.cache_clear()
+    yield requests, responses
+    get_supabase.cache_clear()
+
+def test_locations_uses_distinct_locations_rpc(postgrest):
+    requests, responses = postgrest
+    responses["/rest/v1/rpc/distinct_locations"] = lambda request: httpx.Response(
+        200, json=[{"location": "Park"}, {"location": "Campus"}]
+    )
+
+    with TestClient(main.app) as client:
+        response = client.get("/api/locations")
+
+    assert response.status_code == 200
+    assert response.json() == {"locations": ["Park", "Campus"]}
+    assert requests[0].method == "POST"
+    assert json.loads(requests[0].content) == {}
+
+def test_upload_reports_failed_chunks_after_all_finish(postgrest):
+    requests, responses = postgrest
+
+    def insert(request):
+        rows = json.loads(request.content)
+        if rows[0]["species_id"] == 0:
+            return httpx.Response(400, json={"message": "bad chunk", "code": "23505"})
+        return httpx.Response(201, json=rows)
+
+    responses["/rest/v1/trees"] = insert
+    tree = {
+        "species_id": 1, "scientific_name": "Quercus robur", "common_name": "Oak",
+        "latitude": 12.9, "longitude": 77.6, "height": 10, "width": 2,
+        "carbon_seq": 20, "location": "Park", "date": "2024-05-01", "time": "10:00",
+    }
+    trees = [dict(tree, species_id=0)] * main.INSERT_CHUNK_SIZE + [tree] * 700
+
+    with TestClient(main.app) as client:
+        response = client.post("/api/upload-data", json={"trees": trees})
+
+    assert response.status_code == 500
+    detail = response.json()["detail"]
+    assert detail["count"] == 700
+    assert [(chunk["start"], chunk["end"]) for chunk in detail["failed"]] == [(0, main.INSERT_CHUNK_SIZE)]
+    assert len(requests) == 3
+    assert all(row["created_at"] for request in requests for row in json.loads(request.content))
+
+def test_analyzer_version_counts_rows_without_created_at(postgrest):
+    requests, responses = postgrest
+
+    def trees(request):
+        if "created_at" in request.url.params:
+            return httpx.Response(200, json=[{"created_at": "2024-05-01T10:00:00+00:00"}])
+        return httpx.Response(200, json=[{"id": 1}], headers={"Content-Range": "0-0/42"})
+
+    responses["/rest/v1/trees"] = trees
+
+    version = asyncio.run(main._data_version("Park"))
+
+    assert version.endswith(":42:2024-05-01T10:00:00+00:00")
+    latest = next(request for request in requests if "created_at" in request.url.params)
+    assert latest.url.params["created_at"] == "not.is.null"
+    assert latest.url.params["order"] == "created_at.desc"
+
+def test_analyzer_cache_keeps_one_version_per_location(monkeypatch):
+    versions = iter(["1:10:a", "2:11:b", "2:11:b"])
+
+    async def data_version(location):
+        return next(versions)
+
+    async def fetch_trees(location):
+        return [{"common_name": "Oak", "location": location, "carbon_seq": 1.0}]
+
+    monkeypatch.setattr(main, "_data_version", data_version)
+    monkeypatch.setattr(main, "_fetch_trees", fetch_trees)
+    main._build_analyzer.cache_clear()
+    main._analyzer_versions.clear()
+
+    async def run():
+        first = await main._get_analyzer("Park")
+        second = await main._get_analyzer("Park")
+        third = await main._get_analyzer("Park")
+        return first, second, third
+
+    first, second, third = asyncio.run(run())
+
+    assert first is not second
+    assert second is third
+    assert main._build_analyzer.cache_info().currsize == 1
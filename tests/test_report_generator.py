@@ -0,0 +1,19 @@
+from services.analysis import TreeAnalyzer
+from services.report_generator import ReportGenerator
+
+def _trees(count):
+    return [
+        {
+            "id": i, "species_id": i % 3, "common_name": f"Species {i % 3}",
+            "latitude": 12.9, "longitude": 77.6, "height": 5 + i % 7, "width": 1.5,
+            "carbon_seq": 10.0 + i, "oxygen_prod": 7.0, "location": "Park", "date": "2024-05-01",
+        }
+        for i in range(count)
+    ]
+
+def test_report_splits_flowables_taller_than_a_page():
+    location = "Very Long Location Name " * 200
+    pdf = ReportGenerator(TreeAnalyzer(_trees(50)), None).generate_pdf_report(location).getvalue()
+
+    assert pdf.startswith(b"%PDF")
+    assert pdf.count(b"/Type /Page\n") > 4